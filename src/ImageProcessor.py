@@ -37,15 +37,17 @@ class ImageProcessor:
                 ImageOps.flip(image)
             )  # vertical then horizontal filp
 
-    def calculate_signature(self, image_file: str) -> np.ndarray:
+    def calculate_signature(self, image_file: str, packed: bool = False) -> np.ndarray:
         """
         Calculate the signature of a given file.
 
         Args:
             image_file: the image path to calculate the signature for
+            packed: return the signature bits packed into bytes (np.packbits)
 
         Returns:
-            Image signature as Numpy n-dimensional array or None if the file is not a PIL recognized image
+            Image signature as a flat Numpy array of hash_size**2 bits, or of hash_size**2 / 8
+            bytes (np.packbits) when packed, or None if the file is not a PIL recognized image
         """
         try:
             with Image.open(image_file) as pil_image:
@@ -54,7 +56,10 @@ class ImageProcessor:
                 )
                 flipped_image = self.flip_to_brightest_quarter(pil_image)
                 dhash = imagehash.dhash(flipped_image, self.hash_size)
-                signature = dhash.hash.flatten()
+                if packed:
+                    signature = np.packbits(dhash.hash)
+                else:
+                    signature = dhash.hash.flatten()
             return signature
         except FileNotFoundError:
             logging.error(f"File not found: {image_file}")
@@ -1,37 +1,184 @@
 import argparse
+import csv
 import logging
 import os
 import sys
 from collections import defaultdict
-from typing import Dict, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import combinations, pairwise
+from typing import Callable, Dict, List, Tuple
 
 import numpy as np
-import pandas as pd
 
 from ImageProcessor import ImageProcessor
 
+IMAGE_EXTENSIONS = frozenset({".png", ".jpg", ".jpeg"})
+
+# buckets up to this size compare all their pairs, bigger ones only consecutive pairs
+MAX_BUCKET_SIZE = 64
+
+# np.bitwise_count needs numpy>=2.0, older versions count bits through POPCNT_LUT
+HAS_BITWISE_COUNT = hasattr(np, "bitwise_count")
+# single pairs (calculate_similarity and the cluster linkage checks) of signatures up
+# to this many bytes are compared as python ints, int.bit_count has less call overhead
+# than numpy below it
+INT_POPCOUNT_MAX_BYTES = 512
+# signatures up to this many words are scored one word column at a time
+UNROLL_MAX_WORDS = 8
+# bit count of every byte value
+POPCNT_LUT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def hamming_distances(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Calculate the hamming distances between packed signatures, row by row.
+
+    Args:
+        a (np.ndarray): Packed signatures (uint64 words), one per row.
+        b (np.ndarray): Packed signatures (uint64 words), one per row.
+
+    Returns:
+        np.ndarray: Number of differing bits for each pair of rows.
+    """
+    xor = np.bitwise_xor(a, b)
+    if HAS_BITWISE_COUNT:
+        return np.bitwise_count(xor).sum(axis=-1, dtype=np.int64)
+    return POPCNT_LUT[xor.view(np.uint8)].sum(axis=-1, dtype=np.int64)
+
+
+def hamming_distance(a: np.ndarray, b: np.ndarray) -> int:
+    """
+    Calculate the hamming distance between two packed signatures.
+
+    Args:
+        a (np.ndarray): Packed signature (uint64 words).
+        b (np.ndarray): Packed signature (uint64 words).
+
+    Returns:
+        int: Number of differing bits.
+    """
+    return int(hamming_distances(a, b))
+
+
+def int_hamming_distance(a: np.ndarray, b: np.ndarray) -> int:
+    """
+    Calculate the hamming distance between two packed signatures as python ints.
+
+    Args:
+        a (np.ndarray): Packed signature (uint64 words).
+        b (np.ndarray): Packed signature (uint64 words).
+
+    Returns:
+        int: Number of differing bits.
+    """
+    if a.size == 1:
+        # the whole signature fits in one word: a single xor and popcount
+        return (int(a[0]) ^ int(b[0])).bit_count()
+    return (
+        int.from_bytes(a.tobytes(), "big") ^ int.from_bytes(b.tobytes(), "big")
+    ).bit_count()
+
+
+def pair_hamming_kernel(
+    n_words: int,
+) -> Callable[[np.ndarray, np.ndarray, np.ndarray], np.ndarray]:
+    """
+    Build a function calculating the hamming distances between rows idx_a and idx_b
+    of a signature matrix, specialized for signatures of n_words words.
+
+    Narrow signatures are gathered and counted one word column at a time, with the
+    column count fixed here, which beats numpy's reduction over a short last axis.
+
+    Args:
+        n_words (int): Number of uint64 words per signature.
+
+    Returns:
+        Callable: kernel(sig_matrix, idx_a, idx_b) returning the distance of each pair.
+    """
+    if n_words > UNROLL_MAX_WORDS or not HAS_BITWISE_COUNT:
+
+        def kernel(sig_matrix, idx_a, idx_b):
+            return hamming_distances(sig_matrix[idx_a], sig_matrix[idx_b])
+
+        return kernel
+
+    def kernel(sig_matrix, idx_a, idx_b):
+        hd = np.zeros(len(idx_a), dtype=np.int64)
+        for word in range(n_words):
+            column = sig_matrix[:, word]
+            hd += np.bitwise_count(column[idx_a] ^ column[idx_b])
+        return hd
+
+    return kernel
+
+
+class DisjointSet:
+    """
+    Union-find over integer ids, with path compression and union by size.
+    """
+
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+        self.size = [1] * size
+
+    def find(self, x: int) -> int:
+        """Return the root id of the set containing x."""
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a: int, b: int) -> None:
+        """Merge the sets containing a and b."""
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return
+        if self.size[root_a] < self.size[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        self.size[root_a] += self.size[root_b]
+
 
 class LSHProcessor:
     """
     Locality Sensitive Hashing Processor for image similarity detection.
     """
 
-    def __init__(self, hash_size: int, bands: int):
+    def __init__(self, hash_size: int, bands: int, capacity: int = 1024):
         """
         Initialize LSHProcessor with hash size and number of bands.
 
         Args:
             hash_size (int): Size of the image hash.
             bands (int): Number of bands for LSH.
+            capacity (int): Expected number of images, the signature matrix
+                grows past it when needed.
         """
         self.hash_size = hash_size
         self.bands = bands
         self.rows = hash_size**2 // bands
-        self.hash_buckets_list = [{} for _ in range(bands)]
-        self.signatures: Dict[str, np.ndarray] = {}
+        # signatures are packed into 64 bit words, zero padded at the end
+        self.n_words = -(-(hash_size**2) // 64)
+        # comparison kernels are picked once for this signature width
+        if self.n_words * 8 <= INT_POPCOUNT_MAX_BYTES:
+            self._hamming_distance = int_hamming_distance
+        else:
+            self._hamming_distance = hamming_distance
+        self._pair_hamming = pair_hamming_kernel(self.n_words)
+        self.hash_buckets_list = [defaultdict(list) for _ in range(bands)]
+        # one row of packed signature per image, rows indexed through path_to_idx
+        self.sig_matrix = np.zeros((max(capacity, 1), self.n_words), dtype=np.uint64)
+        self.path_to_idx: Dict[str, int] = {}
+        self.paths: List[str] = []
         self.labels: Dict[str, int] = {}
         self.label_counter = 0
         self.similarity_scores: List[Tuple[str, str, float]] = []
+        # labels and scores of every processed threshold, cleared by add_signature
+        self._results: Dict[
+            float, Tuple[Dict[str, int], List[Tuple[str, str, float]]]
+        ] = {}
 
     def add_signature(self, file_path: str, signature: np.ndarray):
         """
@@ -39,18 +186,48 @@ class LSHProcessor:
 
         Args:
         file_path (str): File path of the image.
-        signature (np.ndarray): Image signature as Numpy n-dimensional array.
+        signature (np.ndarray): Image signature, either packed (np.packbits) or as
+            calculate_signature's hash_size**2 bits.
         """
         if signature is None:
             return
-        self.signatures[file_path] = np.packbits(signature)
-
-        for i in range(self.bands):
-            signature_band = signature[i * self.rows: (i + 1) * self.rows]
-            signature_band_bytes = signature_band.tobytes()
-            if signature_band_bytes not in self.hash_buckets_list[i]:
-                self.hash_buckets_list[i][signature_band_bytes] = []
-            self.hash_buckets_list[i][signature_band_bytes].append(file_path)
+        self._results.clear()
+        if signature.size == self.hash_size**2:
+            signature = np.packbits(signature)
+        idx = self.path_to_idx.setdefault(file_path, len(self.paths))
+        if idx == len(self.paths):
+            self.paths.append(file_path)
+            if idx == len(self.sig_matrix):
+                self.sig_matrix = np.concatenate(
+                    (self.sig_matrix, np.zeros_like(self.sig_matrix))
+                )
+        self.sig_matrix[idx].view(np.uint8)[: signature.size] = signature
+
+        if self.rows % 8 == 0:
+            # byte aligned bands are a zero-copy view of the packed signature
+            band_matrix = signature[: self.bands * self.rows // 8].reshape(
+                self.bands, -1
+            )
+        else:
+            bits = np.unpackbits(signature, count=self.bands * self.rows)
+            band_matrix = np.packbits(bits.reshape(self.bands, self.rows), axis=1)
+
+        band_size = band_matrix.shape[1]
+        if band_size in (1, 2, 4, 8):
+            # one big-endian int per band, the same key as int.from_bytes(band, "big")
+            band_keys = band_matrix.view(f">u{band_size}").ravel().tolist()
+        else:
+            packed_bands = band_matrix.tobytes()
+            band_keys = [
+                packed_bands[i * band_size : (i + 1) * band_size]
+                for i in range(self.bands)
+            ]
+            if self.rows <= 64:
+                # a band fitting in 64 bits is keyed by a small int, cheaper to hash
+                band_keys = [int.from_bytes(key, "big") for key in band_keys]
+
+        for hash_buckets, band_key in zip(self.hash_buckets_list, band_keys):
+            hash_buckets[band_key].append(idx)
 
     def calculate_similarity(self, pair: Tuple[str, str]) -> Tuple[str, str, float]:
         """
@@ -65,10 +242,9 @@ class LSHProcessor:
         """
         img_a, img_b = pair
         try:
-            hd = np.count_nonzero(
-                np.unpackbits(self.signatures[img_a])
-                != np.unpackbits(self.signatures[img_b])
-            )
+            sig_a = self.sig_matrix[self.path_to_idx[img_a]]
+            sig_b = self.sig_matrix[self.path_to_idx[img_b]]
+            hd = self._hamming_distance(sig_a, sig_b)
             similarity = (self.hash_size**2 - hd) / self.hash_size**2
             return img_a, img_b, similarity
         except KeyError:
@@ -76,33 +252,136 @@ class LSHProcessor:
             return img_a, img_b, 0.0
 
     def process_similarities(
-        self, threshold: float, collect_scores: bool = False
+        self, threshold: float, collect_scores: bool = True
     ) -> None:
         """
-        Process and assign labels or collect similarity scores based on threshold.
+        Process and assign labels and collect similarity scores based on threshold.
 
         Args:
             threshold (float): Similarity threshold to consider images as similar.
-            collect_scores (bool): Flag to indicate if similarity scores should be collected.
+            collect_scores (bool): Unused, kept for existing callers. Scores are always
+                collected, they cost nothing once the pairs are scored.
         """
+        paths = self.paths
+        if not paths:
+            return
+
+        # a pair can collide in several bands, compare it only once
+        candidate_pairs: Dict[Tuple[int, int], None] = {}
         for hash_buckets in self.hash_buckets_list:
             for matched_imgs in hash_buckets.values():
-                if len(matched_imgs) > 1:
-                    for image_a, image_b in zip(matched_imgs, matched_imgs[1:]):
-                        img_a, img_b, similarity = self.calculate_similarity(
-                            (image_a, image_b)
-                        )
-                        if similarity >= threshold:
-                            if img_a not in self.labels:
-                                self.labels[img_a] = self.label_counter
-                                self.label_counter += 1
-                            if img_b not in self.labels:
-                                self.labels[img_b] = self.labels[img_a]
-
-                            if collect_scores:
-                                self.similarity_scores.append(
-                                    (img_a, img_b, similarity)
-                                )
+                if len(matched_imgs) < 2:
+                    continue
+                if len(matched_imgs) <= MAX_BUCKET_SIZE:
+                    bucket_pairs = combinations(matched_imgs, 2)
+                else:
+                    # all pairs of a huge bucket is quadratic, chain its members instead
+                    bucket_pairs = pairwise(matched_imgs)
+                for idx_a, idx_b in bucket_pairs:
+                    key = (idx_a, idx_b) if idx_a < idx_b else (idx_b, idx_a)
+                    candidate_pairs[key] = None
+        if not candidate_pairs:
+            return
+        pairs = np.array(list(candidate_pairs), dtype=np.intp)
+        similarities = self._pair_similarities(pairs)
+
+        similar = np.flatnonzero(similarities >= threshold)
+        disjoint_set = DisjointSet(len(paths))
+        members: Dict[int, List[int]] = {}
+        # merge the closest pairs first, so clusters grow around their best matches
+        by_similarity = similar[np.argsort(-similarities[similar], kind="stable")]
+        for idx_a, idx_b in pairs[by_similarity].tolist():
+            root_a, root_b = disjoint_set.find(idx_a), disjoint_set.find(idx_b)
+            if root_a == root_b:
+                continue
+            members_a = members.pop(root_a, [root_a])
+            members_b = members.pop(root_b, [root_b])
+            # complete linkage, chaining would label images that are not near duplicates
+            if len(members_a) + len(members_b) > 2 and not self._all_similar(
+                members_a, members_b, threshold
+            ):
+                members[root_a], members[root_b] = members_a, members_b
+                continue
+            disjoint_set.union(root_a, root_b)
+            members[disjoint_set.find(root_a)] = members_a + members_b
+
+        # label every cluster of near duplicates, in order of first match
+        root_labels: Dict[int, int] = {}
+        for (idx_a, idx_b), similarity in zip(
+            pairs[similar].tolist(), similarities[similar].tolist()
+        ):
+            for idx in (idx_a, idx_b):
+                if paths[idx] not in self.labels:
+                    root = disjoint_set.find(idx)
+                    if root not in root_labels:
+                        root_labels[root] = self.label_counter
+                        self.label_counter += 1
+                    self.labels[paths[idx]] = root_labels[root]
+
+            self.similarity_scores.append((paths[idx_a], paths[idx_b], similarity))
+
+    def _pair_similarities(self, pairs: np.ndarray) -> np.ndarray:
+        """
+        Calculate the similarity of image pairs given as rows of signature indices.
+
+        Args:
+            pairs (np.ndarray): (n, 2) array of row indices into sig_matrix.
+
+        Returns:
+            np.ndarray: Similarity score of each pair on a (0-1) scale.
+        """
+        n_bits = self.hash_size**2
+        hd = self._pair_hamming(self.sig_matrix, pairs[:, 0], pairs[:, 1])
+        return (n_bits - hd) / n_bits
+
+    def _all_similar(
+        self, members_a: List[int], members_b: List[int], threshold: float
+    ) -> bool:
+        """
+        Check that every image of one cluster is similar to every image of another.
+
+        Args:
+            members_a (List[int]): Row indices of the first cluster.
+            members_b (List[int]): Row indices of the second cluster.
+            threshold (float): Similarity threshold to consider images as similar.
+
+        Returns:
+            bool: True if all the cross pairs reach the threshold.
+        """
+        n_bits = self.hash_size**2
+        sig_matrix, hamming = self.sig_matrix, self._hamming_distance
+        return all(
+            (n_bits - hamming(sig_matrix[idx_a], sig_matrix[idx_b])) / n_bits
+            >= threshold
+            for idx_a in members_a
+            for idx_b in members_b
+        )
+
+    def run(
+        self, threshold: float, collect_scores: bool = False
+    ) -> Tuple[Dict[str, int], List[Tuple[str, str, float]]]:
+        """
+        Label all images and collect similarity scores in a single pass.
+        Results are cached per threshold until another signature is added.
+
+        Args:
+            threshold (float): Similarity threshold to consider images as similar.
+            collect_scores (bool): Flag to indicate if similarity scores should be returned.
+
+        Returns:
+            Tuple[Dict[str, int], List[Tuple[str, str, float]]]: Mapping of image file paths
+            to their assigned labels, and the similarity scores of near-duplicate pairs
+            (empty unless collect_scores).
+        """
+        if threshold not in self._results:
+            self.labels = {}
+            self.label_counter = 0
+            self.similarity_scores = []
+            self.process_similarities(threshold)
+            self._assign_labels_remaining_images()
+            self._results[threshold] = (self.labels, self.similarity_scores)
+        labels, similarity_scores = self._results[threshold]
+        return labels, similarity_scores if collect_scores else []
 
     def assign_labels(self, threshold: float) -> Dict[str, int]:
         """
@@ -114,14 +393,13 @@ class LSHProcessor:
         Returns:
             Dict[str, int]: Mapping of image file paths to their assigned labels.
         """
-        self.process_similarities(threshold)
-        self._assign_labels_remaining_images()
-        return self.labels
+        labels, _ = self.run(threshold)
+        return labels
 
     def _assign_labels_remaining_images(self) -> None:
         """Assign labels to remaining images (not part of any near-duplicate pair)"""
 
-        for file_path in self.signatures.keys():
+        for file_path in self.paths:
             if file_path not in self.labels:
                 self.labels[file_path] = self.label_counter
                 self.label_counter += 1
@@ -134,8 +412,8 @@ class LSHProcessor:
             threshold (float): Similarity threshold to consider images as similar.
 
         """
-        self.process_similarities(threshold, collect_scores=True)
-        return self.similarity_scores
+        _, similarity_scores = self.run(threshold, collect_scores=True)
+        return similarity_scores
 
 
 # helper functions
@@ -149,13 +427,14 @@ def get_image_files(input_dir: str) -> List[str]:
     Returns:
         List[str]: List of image file paths.
     """
-    image_extensions = (".png", ".jpg", ".jpeg")
     try:
-        file_list = [
-            os.path.join(input_dir, f)
-            for f in os.listdir(input_dir)
-            if f.lower().endswith(image_extensions)
-        ]
+        with os.scandir(input_dir) as entries:
+            file_list = [
+                entry.path
+                for entry in entries
+                if os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS
+                and entry.is_file()
+            ]
         return file_list
     except FileNotFoundError:
         logging.error(f"Directory not found: {input_dir}")
@@ -175,10 +454,14 @@ def process_images(
     Returns:
         LSHProcessor: Instance of LSHProcessor populated with image signatures.
     """
-    lsh_processor = LSHProcessor(hash_size, bands)
-    for file_path in file_list:
-        signature = image_processor.calculate_signature(file_path)
-        lsh_processor.add_signature(file_path, signature)
+    lsh_processor = LSHProcessor(hash_size, bands, capacity=len(file_list))
+    # decoding is I/O and C bound, so threads overlap it; buckets are only filled here
+    with ThreadPoolExecutor(max_workers=(os.cpu_count() or 1) * 2) as executor:
+        signatures = executor.map(
+            partial(image_processor.calculate_signature, packed=True), file_list
+        )
+        for file_path, signature in zip(file_list, signatures):
+            lsh_processor.add_signature(file_path, signature)
     return lsh_processor
 
 
@@ -198,7 +481,6 @@ def find_duplicates(
         Dict[str, int]: Dictionary of image file paths and their assigned labels.
     """
     image_processor = ImageProcessor(hash_size)
-    similarity_scores = []
 
     try:
         file_list = get_image_files(input_dir)
@@ -206,12 +488,7 @@ def find_duplicates(
             raise ValueError(f"No valid images found in directory {input_dir}")
 
         lsh_processor = process_images(hash_size, bands, image_processor, file_list)
-        labels = lsh_processor.assign_labels(threshold)
-
-        if gen_socres:
-            similarity_scores = lsh_processor.get_similarity_scores(threshold)
-
-        return labels, similarity_scores
+        return lsh_processor.run(threshold, collect_scores=gen_socres)
 
     except ValueError as ve:
         logging.error(str(ve))
@@ -238,8 +515,13 @@ def get_results(
     labels, similarity_scores = find_duplicates(
         input_dir, threshold, hash_size, bands, gen_socres
     )
-    df = pd.DataFrame(list(labels.items()), columns=["filename", "label"])
-    df.sort_values("label").to_csv(output_file)
+    # rows keep their position in labels as the index column, ordered by label
+    rows = sorted(enumerate(labels.items()), key=lambda row: row[1][1])
+    with open(output_file, "w", newline="") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(["", "filename", "label"])
+        for i, (filename, label) in rows:
+            writer.writerow([i, filename, label])
 
     if gen_socres:
         generate_similarity_scores(
@@ -250,15 +532,15 @@ def get_results(
 def generate_similarity_scores(similarity_scores: List[Tuple[str, str, float]]) -> None:
     """
     outputs a  csv of  images file paths and similarity scores
-    
+
 
     """
     scores_file = "results/scores.csv"
     os.makedirs(os.path.dirname(scores_file), exist_ok=True)
-    df_scores = pd.DataFrame(
-        similarity_scores, columns=["imageA", "imageB", "similarity"]
-    )
-    df_scores.to_csv(scores_file, index=False)
+    with open(scores_file, "w", newline="") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(["imageA", "imageB", "similarity"])
+        writer.writerows(similarity_scores)
 
 
 def main(argv):
@@ -279,7 +561,8 @@ def main(argv):
         "--threshold",
         type=float,
         default=0.8,
-        help="Threshold for near duplicates.",
+        help="Threshold for near duplicates, any two images of a label are at least "
+        "this similar.",
     )
     parser.add_argument(
         "-s",
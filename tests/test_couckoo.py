@@ -0,0 +1,204 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import couckoo
+from couckoo import (
+    DisjointSet,
+    LSHProcessor,
+    generate_similarity_scores,
+    get_results,
+    hamming_distances,
+    pair_hamming_kernel,
+)
+from ImageProcessor import ImageProcessor
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+
+def test_add_signature_accepts_unpacked_signature():
+    image_file = str(DATA_DIR / "bus3531.jpg")
+    image_processor = ImageProcessor(16)
+    unpacked = LSHProcessor(16, 16)
+    packed = LSHProcessor(16, 16)
+
+    unpacked.add_signature(image_file, image_processor.calculate_signature(image_file))
+    packed.add_signature(
+        image_file, image_processor.calculate_signature(image_file, packed=True)
+    )
+
+    assert np.array_equal(unpacked.sig_matrix[0], packed.sig_matrix[0])
+    assert [dict(b) for b in unpacked.hash_buckets_list] == [
+        dict(b) for b in packed.hash_buckets_list
+    ]
+
+
+def near_duplicate_processor(n_images: int = 4) -> LSHProcessor:
+    """8x8 signatures that differ from each other by one bit of their own band."""
+    lsh_processor = LSHProcessor(8, 8)
+    for i in range(n_images):
+        bits = np.zeros(64, dtype=bool)
+        bits[i * 8] = True
+        lsh_processor.add_signature(f"img{i}", bits)
+    return lsh_processor
+
+
+def test_get_similarity_scores_after_assign_labels():
+    lsh_processor = near_duplicate_processor()
+
+    labels = lsh_processor.assign_labels(0.9)
+    scores = lsh_processor.get_similarity_scores(0.9)
+
+    assert len(set(labels.values())) == 1
+    assert len(scores) == 6
+    assert all(similarity == 62 / 64 for _, _, similarity in scores)
+
+
+def test_run_caches_per_threshold():
+    lsh_processor = near_duplicate_processor()
+
+    labels, _ = lsh_processor.run(0.9)
+    strict_labels, strict_scores = lsh_processor.run(0.99, collect_scores=True)
+
+    assert len(set(labels.values())) == 1
+    assert len(set(strict_labels.values())) == 4
+    assert strict_scores == []
+    assert lsh_processor.run(0.9)[0] is labels
+
+
+def test_add_signature_after_run_is_labelled():
+    lsh_processor = near_duplicate_processor(3)
+    lsh_processor.assign_labels(0.9)
+
+    bits = np.zeros(64, dtype=bool)
+    bits[3 * 8] = True
+    lsh_processor.add_signature("img3", bits)
+    labels = lsh_processor.assign_labels(0.9)
+    scores = lsh_processor.get_similarity_scores(0.9)
+
+    assert set(labels) == {"img0", "img1", "img2", "img3"}
+    assert any("img3" in (img_a, img_b) for img_a, img_b, _ in scores)
+
+
+def test_clusters_do_not_chain_past_threshold():
+    # a - b - c - d, each 6 bits from the next, so a and c are 12 bits apart
+    lsh_processor = LSHProcessor(8, 8)
+    bits = np.zeros(64, dtype=bool)
+    for i, name in enumerate("abcd"):
+        if i:
+            bits[(i - 1) * 8 : (i - 1) * 8 + 6] = True
+        lsh_processor.add_signature(name, bits.copy())
+
+    labels, scores = lsh_processor.run(58 / 64, collect_scores=True)
+
+    assert len(scores) == 3
+    for img_a, img_b in ("ac", "bd", "ad"):
+        assert labels[img_a] != labels[img_b]
+
+
+def test_clique_merges_into_one_label():
+    # a == b and c == d, one bit apart, every pair of the four is near duplicate
+    lsh_processor = LSHProcessor(8, 8)
+    bits = np.zeros(64, dtype=bool)
+    lsh_processor.add_signature("a", bits)
+    lsh_processor.add_signature("b", bits)
+    bits = bits.copy()
+    bits[0] = True
+    lsh_processor.add_signature("c", bits)
+    lsh_processor.add_signature("d", bits)
+
+    labels = lsh_processor.assign_labels(0.9)
+
+    assert len(set(labels.values())) == 1
+
+
+def test_disjoint_set_union_find():
+    disjoint_set = DisjointSet(5)
+    disjoint_set.union(0, 1)
+    disjoint_set.union(3, 4)
+    disjoint_set.union(1, 4)
+
+    assert len({disjoint_set.find(i) for i in (0, 1, 3, 4)}) == 1
+    assert disjoint_set.find(2) == 2
+    assert disjoint_set.size[disjoint_set.find(0)] == 4
+
+
+@pytest.mark.parametrize(
+    "hash_size, bands", [(16, 16), (16, 4), (16, 1), (8, 8), (10, 5), (10, 4), (12, 3)]
+)
+def test_band_buckets_match_bit_slices(hash_size, bands):
+    rng = np.random.default_rng(hash_size * bands)
+    lsh_processor = LSHProcessor(hash_size, bands)
+    rows = hash_size**2 // bands
+    expected = [{} for _ in range(bands)]
+    # sparse noise over a few base signatures, so images share buckets
+    bases = rng.integers(0, 2, (3, hash_size**2)).astype(bool)
+    for idx in range(40):
+        bits = bases[idx % 3] ^ (rng.random(hash_size**2) < 0.01)
+        lsh_processor.add_signature(str(idx), np.packbits(bits))
+        for i in range(bands):
+            band = bits[i * rows : (i + 1) * rows].tobytes()
+            expected[i].setdefault(band, []).append(idx)
+
+    for hash_buckets, bit_slice_buckets in zip(
+        lsh_processor.hash_buckets_list, expected
+    ):
+        assert sorted(hash_buckets.values()) == sorted(bit_slice_buckets.values())
+
+
+@pytest.mark.parametrize("n_words", [1, 2, 4, 8, 9, 16])
+def test_pair_hamming_kernel_matches_hamming_distances(n_words):
+    rng = np.random.default_rng(n_words)
+    sig_matrix = rng.integers(0, 2**64, (20, n_words), dtype=np.uint64)
+    idx_a, idx_b = rng.integers(0, 20, (2, 50))
+
+    kernel = pair_hamming_kernel(n_words)
+
+    assert np.array_equal(
+        kernel(sig_matrix, idx_a, idx_b),
+        hamming_distances(sig_matrix[idx_a], sig_matrix[idx_b]),
+    )
+
+
+def test_hamming_distances_lookup_table_fallback(monkeypatch):
+    rng = np.random.default_rng(0)
+    sig_matrix = rng.integers(0, 2**64, (20, 4), dtype=np.uint64)
+    idx_a, idx_b = rng.integers(0, 20, (2, 50))
+    xor = sig_matrix[idx_a] ^ sig_matrix[idx_b]
+    expected = np.unpackbits(xor.view(np.uint8), axis=-1).sum(axis=-1)
+
+    monkeypatch.setattr(couckoo, "HAS_BITWISE_COUNT", False)
+
+    assert np.array_equal(
+        hamming_distances(sig_matrix[idx_a], sig_matrix[idx_b]), expected
+    )
+    assert np.array_equal(pair_hamming_kernel(4)(sig_matrix, idx_a, idx_b), expected)
+
+
+def test_labels_csv_matches_pandas(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    labels = {"data/c.jpg": 1, "data/a.jpg": 0, "data/d.jpg": 2, "data/b.jpg": 1}
+    monkeypatch.setattr(couckoo, "find_duplicates", lambda *args: (labels, []))
+
+    get_results("data", 0.8, 16, 16, False)
+
+    expected = (
+        pd.DataFrame(list(labels.items()), columns=["filename", "label"])
+        .sort_values("label", kind="stable")
+        .to_csv()
+    )
+    assert (tmp_path / "results" / "labels.csv").read_text() == expected
+
+
+def test_similarity_scores_csv_matches_pandas(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    similarity_scores = [("data/a.jpg", "data/b.jpg", 0.86328125), ("x", "y", 1.0)]
+
+    generate_similarity_scores(similarity_scores)
+
+    expected = pd.DataFrame(
+        similarity_scores, columns=["imageA", "imageB", "similarity"]
+    ).to_csv(index=False)
+    assert (tmp_path / "results" / "scores.csv").read_text() == expected